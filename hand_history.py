@@ -1,178 +1,251 @@
 #!/usr/bin/env python3
 import re
 import sys
+from array import array
+from itertools import compress, repeat
+from operator import and_, gt, le, sub
 from typing import List, Dict, Set, Tuple
 from dataclasses import dataclass
 
+# Matched from the start of the line. Each alternative scans the whole line
+# before the next one is tried, so a line mentioning several events resolves
+# in the order listed here rather than by position. The leading lookaheads
+# let an alternative whose keyword is absent fail after one fast scan.
+_LINE_RE = re.compile(
+    r"(?=.*Hand #).*?(?P<hand>Hand #)"
+    r"|(?=.*Seat).*?(?P<part>Seat\s*.*:\s+(?P<part_name>[a-zA-Z0-9_]+))"
+    r"|(?=.*Show Down).*?(?P<showdown>Show Down)"
+    r"|(?=.*wins|.*splits).*?(?P<winner>(?P<winner_name>[a-zA-Z0-9_]+)\s+(?:wins|splits)\s+.*\s+\((?P<winner_amount>[0-9.]+)\))"
+    r"|(?=.*shows).*?(?P<show>(?P<show_name>[a-zA-Z0-9_]+)\s+shows)"
+    r"|(?=.*bets|.*calls|.*raises to).*?(?P<vpip>(?P<vpip_name>[a-zA-Z0-9_]+)\s+(?:bets|calls|raises to)\s+[0-9.]+)"
+    r"|(?=.*posts).*?(?P<blind>(?P<blind_name>[a-zA-Z0-9_]+)\s+posts (?:small|big) blind\s+(?P<blind_amount>[0-9.]+))"
+    r"|(?=.*Rake).*?(?P<rake>Rake\s+\([0-9.]+\)\s*Pot\s+\([0-9.]+\)\s+Players\s+\((?P<rake_players>[^)]+)\))"
+    r"|(?=.*adds).*?(?P<adds>(?P<adds_name>[a-zA-Z0-9_]+)\s+adds\s+(?P<adds_amount>[0-9.]+)\s+chips)"
+)
+_PLAYER_AMOUNT_RE = re.compile(r"([a-zA-Z0-9_]+):\s*([0-9.]+)")
+
+def _to_mills(amount: str) -> int:
+    # Logged amounts are in tenths of a dollar, with up to two decimals, so
+    # integer thousandths of a dollar hold them exactly. Split on the point
+    # rather than going through float; anything finer rounds to a mill.
+    if "." not in amount:
+        return int(amount) * 100
+    whole, _, frac = amount.partition(".")
+    return int(whole or "0") * 100 + int((frac + "00")[:2]) + (frac[2:3] >= "5")
+
 @dataclass 
 class Pot:
-    amounts: Dict[str, float]
-    winners: Dict[str, float]
+    __slots__ = ("amounts", "winners", "at_showdown")
+    amounts: Dict[str, int]
+    winners: Dict[str, int]
     at_showdown: Set[str]
 
 @dataclass
 class HandLog:
-    has_showdown = False
-    blinds: Dict[str, float] 
+    __slots__ = ("has_showdown", "blinds", "at_table", "vpip", "pots", "participants")
+    has_showdown: bool
+    blinds: Dict[str, int] 
     at_table: Set[str]
     vpip: Set[str]
     pots: List[Pot]
+    # Everyone with chips in any of the pots.
+    participants: Set[str]
     
     @staticmethod
     def empty_hand():
-        return HandLog({}, set(), set(), [])
+        return HandLog(False, {}, set(), set(), [], set())
 
     def is_empty(self):
         return not (self.blinds or self.at_table or self.vpip or self.pots)
 
 @dataclass
 class HandHistory:
+    __slots__ = ("hand_logs", "adds", "all_players")
     hand_logs: List[HandLog]
-    adds: List[Tuple[str, float]]
+    adds: List[Tuple[str, int]]
+    # Everyone who posted a blind in one of hand_logs.
+    all_players: Set[str]
+
+@dataclass
+class HandTable:
+    # Per-player columns indexed as column[player_id][row], with one row for
+    # each hand the player appears in. Blinds are only ever summed, so they
+    # are kept as one running total per player.
+    __slots__ = ("player_ids", "won", "bet", "blinds_paid", "at_table", "vpip", "part", "at_showdown", "has_showdown")
+    player_ids: Dict[str, int]
+    won: List[array]
+    bet: List[array]
+    blinds_paid: array
+    at_table: List[bytearray]
+    vpip: List[bytearray]
+    part: List[bytearray]
+    at_showdown: List[bytearray]
+    has_showdown: List[bytearray]
 
 
 def read_hand_history(f) -> HandHistory:
     hands: List[HandLog] = []
-    hand_start_re = re.compile(r"Hand #")
-    winner_re = re.compile(r"(?P<name>[a-zA-Z0-9_]+)\s+(?P<win_type>wins|splits)\s+.*\s+\((?P<amount>[0-9.]+)\).*")
-    vpip_re = re.compile(r"(?P<name>[a-zA-Z0-9_]+)\s+(bets|calls|raises to)\s+(?P<amount>[0-9.]+)")
-    blinds_in = re.compile(r"(?P<name>[a-zA-Z0-9_]+)\s+(posts (small|big) blind)\s+(?P<amount>[0-9.]+)")
-    rake_re = re.compile(r"Rake\s+\(([0-9.]+)\)\s*Pot\s+\([0-9.]+\)\s+Players\s+\((?P<players>[^)]+)\)")
-    part_re = re.compile(r"Seat\s*.*:\s+(?P<name>[a-zA-Z0-9_]+)")
-    show_re = re.compile(r"(?P<name>[a-zA-Z0-9_]+)\s+shows.*")
-    showdown_re = re.compile(r"Show Down")
-    adds_re = re.compile(r"(?P<name>[a-zA-Z0-9_]+)\s+adds\s+(?P<amount>[0-9.]+)\s+chips.*")
+    line_match = _LINE_RE.match
     hand = HandLog.empty_hand()
+    at_table_add, vpip_add, blinds, pots_append = hand.at_table.add, hand.vpip.add, hand.blinds, hand.pots.append
     shows = []
     pot = None
     player_adds = []
-    for i, line in enumerate(f, 1):
+    all_players: Set[str] = set()
+    for line in f.read().splitlines():
         if line.strip() == "":
             if not hand.is_empty():
                 hands.append(hand)
+                all_players.update(blinds)
             hand = HandLog.empty_hand()
-        hand_start = hand_start_re.search(line)
-        if hand_start:
-            hand = HandLog.empty_hand()
-            shows = []
+            at_table_add, vpip_add, blinds, pots_append = hand.at_table.add, hand.vpip.add, hand.blinds, hand.pots.append
             continue
-
-        part_match = part_re.search(line)
-        if part_match:
-            name = part_match.group("name")
-            hand.at_table.add(name)
+        # Every event needs one of these literals; substring tests are far
+        # cheaper than a regex match on the (majority of) lines without one.
+        # It also beats one finditer over the whole buffer, since re has no
+        # prefilter for an alternation and would try it at every character.
+        if not ("Seat" in line or "posts" in line or "calls" in line or "bets" in line
+                or "raises to" in line or "shows" in line or "wins" in line or "splits" in line
+                or "Rake" in line or "Hand #" in line or "Show Down" in line or "adds" in line):
             continue
-        if showdown_re.search(line):
-            hand.has_showdown = True
+        match = line_match(line)
+        if not match:
             continue
-        winner_match = winner_re.search(line)
-        if winner_match:
-            name = winner_match.group("name")
-            amount = float(winner_match.group("amount")) / 10.0
+        kind = match.lastgroup
+
+        if kind == "hand":
+            hand = HandLog.empty_hand()
+            at_table_add, vpip_add, blinds, pots_append = hand.at_table.add, hand.vpip.add, hand.blinds, hand.pots.append
+            shows = []
+        elif kind == "part":
+            at_table_add(match.group("part_name"))
+        elif kind == "showdown":
+            hand.has_showdown = True
+        elif kind == "winner":
+            name = match.group("winner_name")
+            amount = _to_mills(match.group("winner_amount"))
             if pot is None:
                 pot = Pot({}, {}, set())
             pot.winners[name] = amount
-            continue
-        show_match = show_re.search(line)
-        if show_match:
-            shows.append(show_match.group("name"))
-            continue
-
-        vpip_match = vpip_re.search(line)
-        if vpip_match:
-            name = vpip_match.group("name")
-            hand.vpip.add(name)
-            continue
-
-        blind_match = blinds_in.search(line)
-        if blind_match:
-            name = blind_match.group("name")
-            amount = float(blind_match.group("amount")) / 10.0
-            hand.blinds[name] = amount
-            continue
-
-        rake_match = rake_re.search(line)
-        if rake_match:
+        elif kind == "show":
+            shows.append(match.group("show_name"))
+        elif kind == "vpip":
+            vpip_add(match.group("vpip_name"))
+        elif kind == "blind":
+            name = match.group("blind_name")
+            amount = _to_mills(match.group("blind_amount"))
+            blinds[name] = amount
+        elif kind == "rake":
             assert(isinstance(pot, Pot))
-            players = rake_match.group("players").split(", ")
-            players = [p.split(": ") for p in players]
-            pot.amounts = {name: float(amt) / 10.0 for (name, amt) in players if amt != "0"}
+            players = _PLAYER_AMOUNT_RE.findall(match.group("rake_players"))
+            pot.amounts = {name: _to_mills(amt) for (name, amt) in players if amt != "0"}
             pot.at_showdown = set(shows or [])
-            hand.pots.append(pot)
+            hand.participants.update(pot.amounts)
+            pots_append(pot)
             pot = None
-            continue
-
-        adds_match = adds_re.search(line)
-        if adds_match:
-            player = adds_match.group("name")
-            amount = float(adds_match.group("amount")) / 10.0
+        elif kind == "adds":
+            player = match.group("adds_name")
+            amount = _to_mills(match.group("adds_amount"))
             player_adds.append((player, amount))
 
-    return HandHistory(hands, player_adds)
-
-def player_info(hands: List[HandLog], player: str):
-    total_hands = sum(1 for hand in hands if player in hand.at_table)
-    num_showdown = sum(1 for hand in hands if hand.has_showdown and any(player in pot.at_showdown for pot in hand.pots))
-    num_vpip = sum(1 for hand in hands if player in hand.vpip)
-    num_part = sum(1 for hand in hands if any(player in pot.amounts for pot in hand.pots))
-    num_hands_won = 0
-    num_hands_lost = 0
-    num_hands_lost_vpip = 0
-    num_hands_won_showdown = 0
-    net = 0.0
-    net_won = 0.0
-    gross_won = 0.0
-    net_lost = 0.0
-    blinds_paid = 0.0
-    max_pot = 0.0
-    min_pot = 0.0
+    return HandHistory(hands, player_adds, all_players)
+
+def tabulate_hands(hands: List[HandLog]) -> HandTable:
+    table = HandTable({}, [], [], array("q"), [], [], [], [], [])
+    player_ids = table.player_ids
+    won, bet, blinds_paid = table.won, table.bet, table.blinds_paid
+    at_table, vpip, part, at_showdown = table.at_table, table.vpip, table.part, table.at_showdown
+    has_showdown = table.has_showdown
+    amount_columns = (won, bet)
+    flag_columns = (at_table, vpip, part, at_showdown)
     for hand in hands:
-        amount_won = 0.0
-        amount_bet = 0.0
-        blinds_paid += hand.blinds.get(player, 0.0)
-        for pot in hand.pots:
-            amount_won += pot.winners.get(player, 0.0)
-            amount_bet += pot.amounts.get(player, 0.0)
-        if amount_won > 0.0 and amount_won > amount_bet:
-            num_hands_won += 1
+        names = set(hand.at_table)
+        names.update(hand.vpip, hand.blinds, hand.participants)
+        pots = hand.pots
+        for pot in pots:
+            names.update(pot.winners, pot.at_showdown)
+        for name in names:
+            pid = player_ids.get(name)
+            if pid is None:
+                pid = player_ids[name] = len(player_ids)
+                for column in amount_columns:
+                    column.append(array("q"))
+                for column in flag_columns:
+                    column.append(bytearray())
+                has_showdown.append(bytearray())
+                blinds_paid.append(0)
+            for column in amount_columns:
+                column[pid].append(0)
+            for column in flag_columns:
+                column[pid].append(0)
+            has_showdown[pid].append(hand.has_showdown)
+
+        for name, amount in hand.blinds.items():
+            blinds_paid[player_ids[name]] += amount
+        for name in hand.at_table:
+            at_table[player_ids[name]][-1] = 1
+        for name in hand.vpip:
+            vpip[player_ids[name]][-1] = 1
+        for name in hand.participants:
+            part[player_ids[name]][-1] = 1
+        for pot in pots:
+            for name, amount in pot.winners.items():
+                won[player_ids[name]][-1] += amount
+            for name, amount in pot.amounts.items():
+                bet[player_ids[name]][-1] += amount
             if hand.has_showdown:
-                num_hands_won_showdown += 1
-            gross_won += amount_won
-            net_won += amount_won - amount_bet
-        elif amount_bet > 0.0:
-            net_lost += amount_bet - amount_won
-            num_hands_lost += 1
-            if player in hand.vpip:
-                num_hands_lost_vpip += 1
-        amount_net = amount_won - amount_bet
-        net += amount_net
-        max_pot = max(max_pot, amount_net)
-        min_pot = min(min_pot, amount_net)
-
-    print("{}: ".format(player))
-    print("  Net Winnings: ${:.2f}".format(net))
-    print("  # of Hands At Table: {}".format(total_hands))
-    print("  # of Hands in: {} ({:.2f}%)".format(num_part, 100 * num_part / total_hands))
-    print("  # of Hands VPiP: {} ({:.2f}%)".format(num_vpip, 100 * num_vpip / total_hands))
-    print("  # of Hands @ Showdown: {} ({:.2f}% of hands VPiP)".format(num_showdown, 100 * num_showdown / num_vpip))
-    print("  # of Hands won: {} ({:.2f}% of hands in, {:.2f}% of hands VPiP)".format(num_hands_won, 100*num_hands_won / num_part, 100*num_hands_won / num_vpip))
-    print("  # of Hands won at showdown: {} ({:.2f}% of hands in, {:.2f}% of hands in at showdown)".format(
-        num_hands_won_showdown, 100 * num_hands_won_showdown / num_part, 100 * num_hands_won_showdown / num_showdown))
-    print("  Average Pot Won: (Gross: ${:.2f}, Net: ${:.2f}) on {} hands".format(gross_won / num_hands_won, net_won / num_hands_won, num_hands_won))
-    print("  Max Pot Won (Net): ${:.2f}".format(max_pot))
-    print("  Average Pot Lost: ${:.2f} on {} hands".format(net_lost / num_hands_lost, num_hands_lost))
-    print("  Average Pot Lost (VPiP only): ${:.2f} on {} hands".format((net_lost - blinds_paid) / num_hands_lost_vpip, num_hands_lost_vpip))
-    print("  Max Pot Lost (Net): ${:.2f}".format(min_pot))
+                for name in pot.at_showdown:
+                    at_showdown[player_ids[name]][-1] = 1
+    return table
+
+def player_info(table: HandTable, player: str):
+    pid = table.player_ids[player]
+    total_hands = sum(table.at_table[pid])
+    num_showdown = sum(table.at_showdown[pid])
+    num_vpip = sum(table.vpip[pid])
+    num_part = sum(table.part[pid])
+    won = table.won[pid]
+    bet = table.bet[pid]
+    net_per_hand = array("q", map(sub, won, bet))
+    # Bets are never negative, so winning more than was bet implies winning something.
+    won_mask = bytes(map(gt, won, bet))
+    lost_mask = bytes(map(and_, map(le, won, bet), map(gt, bet, repeat(0))))
+    num_hands_won = won_mask.count(1)
+    num_hands_lost = lost_mask.count(1)
+    num_hands_lost_vpip = sum(map(and_, lost_mask, table.vpip[pid]))
+    num_hands_won_showdown = sum(map(and_, won_mask, table.has_showdown[pid]))
+    net = sum(net_per_hand)
+    net_won = sum(compress(net_per_hand, won_mask))
+    gross_won = sum(compress(won, won_mask))
+    net_lost = sum(map(sub, compress(bet, lost_mask), compress(won, lost_mask)))
+    blinds_paid = table.blinds_paid[pid]
+    max_pot = max(max(net_per_hand, default=0), 0)
+    min_pot = min(min(net_per_hand, default=0), 0)
+
+    sys.stdout.write("".join([
+        f"{player}: \n",
+        f"  Net Winnings: ${net / 1000:.2f}\n",
+        f"  # of Hands At Table: {total_hands}\n",
+        f"  # of Hands in: {num_part} ({100 * num_part / total_hands:.2f}%)\n",
+        f"  # of Hands VPiP: {num_vpip} ({100 * num_vpip / total_hands:.2f}%)\n",
+        f"  # of Hands @ Showdown: {num_showdown} ({100 * num_showdown / num_vpip:.2f}% of hands VPiP)\n",
+        f"  # of Hands won: {num_hands_won} ({100 * num_hands_won / num_part:.2f}% of hands in, {100 * num_hands_won / num_vpip:.2f}% of hands VPiP)\n",
+        f"  # of Hands won at showdown: {num_hands_won_showdown} ({100 * num_hands_won_showdown / num_part:.2f}% of hands in, "
+        f"{100 * num_hands_won_showdown / num_showdown:.2f}% of hands in at showdown)\n",
+        f"  Average Pot Won: (Gross: ${gross_won / num_hands_won / 1000:.2f}, Net: ${net_won / num_hands_won / 1000:.2f}) on {num_hands_won} hands\n",
+        f"  Max Pot Won (Net): ${max_pot / 1000:.2f}\n",
+        f"  Average Pot Lost: ${net_lost / num_hands_lost / 1000:.2f} on {num_hands_lost} hands\n",
+        f"  Average Pot Lost (VPiP only): ${(net_lost - blinds_paid) / num_hands_lost_vpip / 1000:.2f} on {num_hands_lost_vpip} hands\n",
+        f"  Max Pot Lost (Net): ${min_pot / 1000:.2f}\n",
+        "\n",
+    ]))
 
 if __name__ == "__main__":
     hand_history_file = sys.argv[1]
     hand_history = read_hand_history(open(hand_history_file))
-    all_players = set()
-    for hand in hand_history.hand_logs:
-        all_players = all_players | set(hand.blinds.keys())
-    for player in all_players:
-        player_info(hand_history.hand_logs, player)
-        print("")
+    hand_table = tabulate_hands(hand_history.hand_logs)
+    for player in hand_history.all_players:
+        player_info(hand_table, player)
     
 
         